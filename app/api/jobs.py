@@ -22,7 +22,7 @@ from ..models.schemas import (
     SuggestSchemaRequest
 )
 from ..models.enums import WriterType
-from ..utils.file_utils import get_output_files, create_zip_file
+from ..utils.file_utils import get_output_files, create_zip_stream
 from ..utils.schema_converter import json_to_groovy
 from ..utils.helpers import get_job_id_to_use, get_writer_type_from_job
 
@@ -261,9 +261,8 @@ async def get_output(job_id: str):
     if not files:
         raise HTTPException(status_code=404, detail=f"No output files found for job ID: {job_id}")
     
-    zip_bytes = create_zip_file(files)
     return StreamingResponse(
-        zip_bytes, 
+        create_zip_stream(files), 
         media_type="application/zip",
         headers={"Content-Disposition": f"attachment; filename=output-{job_id}.zip"}
     )
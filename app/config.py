@@ -59,6 +59,7 @@ class Settings:
         # LLM settings
         self.llm_provider = os.getenv('LLM_PROVIDER', 'mock')
         self.llm_api_key = os.getenv('LLM_API_KEY')
+        self.llm_concurrency = int(os.getenv('LLM_CONCURRENCY', 8))
         
         # CORS settings
         self.cors_allow_origins = self._config['cors']['allow_origins']
@@ -5,6 +5,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
 from .core.database import neo4j_manager
 from .core.background_tasks import session_cleanup_worker
+from .services.schema_suggestion_service import schema_suggestion_service
+from .services.webhook_service import webhook_service
 
 # Import routers
 from .api.upload import router as upload_router
@@ -24,6 +26,7 @@ async def lifespan(app: FastAPI):
     
     # Start background tasks
     cleanup_task = asyncio.create_task(session_cleanup_worker())
+    webhook_service.start()
     
     print("AtomSpace Builder API started successfully")
     
@@ -42,6 +45,11 @@ async def lifespan(app: FastAPI):
     # Close database connections
     neo4j_manager.close_driver()
     
+    # Flush pending webhooks and close shared HTTP clients
+    await webhook_service.shutdown()
+    await schema_suggestion_service.aclose()
+    await webhook_service.aclose()
+    
     print("AtomSpace Builder API shutdown complete")
 
 
@@ -1,16 +1,67 @@
 """Schema suggestion service using LLM."""
 
 import asyncio
-from copy import deepcopy
-import json
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import hashlib
+from itertools import chain, repeat
 import os
+import random
 import re
-from typing import Any, Dict, List
+import time
+from typing import Any, Dict, List, Optional, Tuple
 import httpx
+import orjson
 from ..models.schemas import DataSource, SuggestedSchema
 from ..config import settings
 
 
+# Shared client so LLM calls reuse pooled keep-alive connections instead of
+# paying a fresh TCP+TLS handshake per request. HTTP/2 lets concurrent calls
+# to the same provider multiplex over one connection.
+_client = httpx.AsyncClient(
+    http2=True,
+    timeout=60,
+    limits=httpx.Limits(max_keepalive_connections=32, max_connections=32, keepalive_expiry=120)
+)
+
+SCHEMA_CACHE_MAX_SIZE = 1024
+SCHEMA_CACHE_TTL = 24 * 60 * 60  # seconds
+
+# Batch checkpoint lines written between fsyncs
+CHECKPOINT_FSYNC_INTERVAL = 16
+
+# Status codes worth retrying; the API may say how long to wait via Retry-After
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRY_BACKOFF = 30  # seconds
+
+# Edge file columns that identify endpoints rather than edge properties
+EDGE_ENDPOINT_COLUMNS = frozenset({"source", "target", "id"})
+
+# Matches Markdown code fences (optionally tagged json) around LLM output
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.MULTILINE)
+
+# Column-name keywords used to infer property types, checked in this order
+_INT_COLUMN_RE = re.compile("id|count|number|quantity|amount")
+_DOUBLE_COLUMN_RE = re.compile("price|cost|rate|percentage|score")
+
+
+@dataclass(slots=True)
+class _MergedEdge:
+    """Accumulator for all connection types between one source/target pair."""
+    source: str
+    target: str
+    data: Dict[str, Any] = field(default_factory=dict)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": f"{self.source}-{self.target}",
+            "type": "relation",
+            "source": self.source,
+            "target": self.target,
+            "data": self.data
+        }
+
 
 class SchemaSuggestionService:
     """Service for generating schema suggestions using LLM."""
@@ -20,45 +71,173 @@ class SchemaSuggestionService:
         self.llm_provider =  settings.llm_provider
         self.api_key = settings.llm_api_key
         self.prompt_file = os.path.join(os.path.dirname(__file__), "..", "prompts", "schema_suggestion_v2.txt")
+        self._prompt_template = self._load_prompt_template()
+        # The template is constant, so hash it once and only hash data sources per call
+        self._template_hash = hashlib.blake2b(self._prompt_template.encode()).digest()
+        # Exact-match cache of serialized normalized schemas keyed by provider + prompt hash
+        self._schema_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # Bounds in-flight LLM requests so bursts queue instead of hitting rate limits
+        self._llm_semaphore = asyncio.Semaphore(settings.llm_concurrency)
         
     async def suggest_schema(self, data_sources: List[DataSource]):
         """Generate schema suggestion from data sources."""
+        data_sources_json = self._data_sources_to_json(data_sources)
+        return await self._suggest_schema(data_sources, data_sources_json, self._cache_key(data_sources_json))
+    
+    async def _suggest_schema(
+        self,
+        data_sources: List[DataSource],
+        data_sources_json: List[Dict[str, Any]],
+        prompt_key: str
+    ) -> Dict[str, Any]:
+        """Generate a schema suggestion from data sources already serialized and hashed."""
+        # Identical prompts produce the same schema, so skip the LLM on a hit
+        cache_key = (self.llm_provider, prompt_key)
+        cached = self._get_cached_schema(cache_key)
+        if cached is not None:
+            return {"schema": cached}
         
         # Create the prompt
-        prompt = self._create_prompt(data_sources)
+        prompt = self._create_prompt(data_sources_json)
         
         # Get LLM response
         if self.llm_provider == "mock":
             schema_json = self._mock_llm_response(data_sources)
         elif self.llm_provider == "openai":
-            schema_json = await self._call_openai(prompt)
+            async with self._llm_semaphore:
+                schema_json = await self._call_openai(prompt)
         elif self.llm_provider == "anthropic":
-            schema_json = await self._call_anthropic(prompt)
+            async with self._llm_semaphore:
+                schema_json = await self._call_anthropic(prompt)
         else:
             raise ValueError(f"Unsupported LLM provider: {self.llm_provider}")
         
         # Parse and validate the response
         try:
-            schema_data = json.loads(schema_json)
+            schema_data = orjson.loads(schema_json)
             schema_data = self._normalize_schema(schema_data)
-            return {"schema": schema_data}
         except Exception as e:
             print(f"Error parsing LLM response: {e}")
             # Return a basic fallback schema
             raise Exception("Failed to parse schema suggestion from LLM response") from e
+        
+        self._store_cached_schema(cache_key, schema_data)
+        return {"schema": schema_data}
     
-    def _create_prompt(self, data_sources: List[DataSource]) -> str:
-        """Create the LLM prompt with data sources."""
+    async def suggest_schemas_batch(
+        self,
+        data_source_groups: List[List[DataSource]],
+        output_jsonl: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Generate schema suggestions for several independent data source groups concurrently.
+        
+        If output_jsonl is given, each completed result is appended to it as a
+        {"key", "schema"} line, and groups already recorded there are not sent
+        to the LLM again, so an interrupted batch can be resumed.
+        """
+        if output_jsonl is None:
+            return await asyncio.gather(
+                *(self.suggest_schema(data_sources) for data_sources in data_source_groups)
+            )
+        
+        completed = self._load_checkpoint(output_jsonl)
+        unsynced = 0
         
-        # Load the prompt template from file
+        with open(output_jsonl, "a+b") as checkpoint:
+            end = checkpoint.seek(0, os.SEEK_END)
+            if end:
+                checkpoint.seek(end - 1)
+                if checkpoint.read(1) != b"\n":
+                    # Terminate a partial record left by an interrupted write
+                    checkpoint.write(b"\n")
+            
+            async def run(data_sources: List[DataSource]) -> Dict[str, Any]:
+                nonlocal unsynced
+                data_sources_json = self._data_sources_to_json(data_sources)
+                key = self._cache_key(data_sources_json)
+                if key in completed:
+                    return completed[key]
+                
+                result = await self._suggest_schema(data_sources, data_sources_json, key)
+                checkpoint.write(orjson.dumps({"key": key, "schema": result}) + b"\n")
+                unsynced += 1
+                if unsynced >= CHECKPOINT_FSYNC_INTERVAL:
+                    unsynced = 0
+                    await asyncio.to_thread(self._sync_checkpoint, checkpoint)
+                return result
+            
+            try:
+                # Let every group finish while the file is open so one failure
+                # does not discard the results of the others
+                results = await asyncio.gather(
+                    *(run(data_sources) for data_sources in data_source_groups),
+                    return_exceptions=True
+                )
+            finally:
+                await asyncio.to_thread(self._sync_checkpoint, checkpoint)
+        
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+    
+    def _sync_checkpoint(self, checkpoint) -> None:
+        """Flush and fsync the checkpoint file; run off the event loop."""
+        checkpoint.flush()
+        os.fsync(checkpoint.fileno())
+    
+    def _load_checkpoint(self, path: str) -> Dict[str, Dict[str, Any]]:
+        """Load completed batch results keyed by input hash."""
+        completed = {}
+        try:
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        record = orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        # Partial line from an interrupted write
+                        continue
+                    completed[record["key"]] = record["schema"]
+        except FileNotFoundError:
+            pass
+        return completed
+    
+    def _get_cached_schema(self, key: tuple) -> Optional[Dict[str, Any]]:
+        """Return a fresh copy of a cached schema if present and not expired."""
+        entry = self._schema_cache.get(key)
+        if entry is None:
+            return None
+        
+        stored_at, schema_bytes = entry
+        if time.monotonic() - stored_at > SCHEMA_CACHE_TTL:
+            del self._schema_cache[key]
+            return None
+        
+        self._schema_cache.move_to_end(key)
+        return orjson.loads(schema_bytes)
+    
+    def _store_cached_schema(self, key: tuple, schema_data: Dict[str, Any]):
+        """Store a schema snapshot, evicting the least recently used entry when full.
+        
+        The schema is kept serialized so callers mutating their result cannot
+        change what later hits return.
+        """
+        self._schema_cache[key] = (time.monotonic(), orjson.dumps(schema_data))
+        self._schema_cache.move_to_end(key)
+        if len(self._schema_cache) > SCHEMA_CACHE_MAX_SIZE:
+            self._schema_cache.popitem(last=False)
+    
+    def _load_prompt_template(self) -> str:
+        """Load the prompt template from file once at startup."""
         try:
             with open(self.prompt_file, 'r') as f:
-                prompt_template = f.read()
+                return f.read()
         except FileNotFoundError:
             print(f"Warning: Prompt file not found at {self.prompt_file}, using fallback prompt")
-            prompt_template = self._get_fallback_prompt()
-        
-        # Add the data sources to the prompt
+            return self._get_fallback_prompt()
+    
+    def _data_sources_to_json(self, data_sources: List[DataSource]) -> List[Dict[str, Any]]:
+        """Convert data sources to the JSON structure embedded in the prompt."""
         data_sources_json = []
         for ds in data_sources:
             ds_dict = {
@@ -73,12 +252,25 @@ class SchemaSuggestionService:
             }
             data_sources_json.append(ds_dict)
         
-        prompt = prompt_template + "\n\n" + json.dumps(data_sources_json, indent=2)
+        return data_sources_json
+    
+    def _cache_key(self, data_sources_json: List[Dict[str, Any]]) -> str:
+        """Hash the prompt inputs: the precomputed template hash plus the data sources."""
+        data_bytes = orjson.dumps(data_sources_json, option=orjson.OPT_SORT_KEYS)
+        return hashlib.blake2b(self._template_hash + data_bytes).hexdigest()
+    
+    def _create_prompt(self, data_sources_json: List[Dict[str, Any]]) -> str:
+        """Create the LLM prompt with data sources."""
+        
+        # Add the data sources to the prompt
+        prompt = self._prompt_template + "\n\n" + orjson.dumps(data_sources_json, option=orjson.OPT_INDENT_2).decode()
         
         return prompt
     
-    def _normalize_schema(self, schema):
-        schema = deepcopy(schema)
+    def _normalize_schema(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge parallel and reversed edges into one edge per node pair."""
+        # Build new edge containers instead of deep-copying the whole schema;
+        # the caller's nested dicts are never mutated.
 
         # 1. Ensure node IDs match their table values
         # table_to_id = {}
@@ -86,8 +278,8 @@ class SchemaSuggestionService:
         #     node["id"] = node["data"]["table"]
         #     table_to_id[node["data"]["name"].lower()] = node["id"]
 
-        # 2. Merge edges between same source/target
-        merged_edges = {}
+        # 2. Merge edges between same source/target, folding in reversed pairs
+        merged_edges: Dict[Tuple[str, str], _MergedEdge] = {}
         for edge in schema["edges"]:
             # src_id = table_to_id.get(edge["source"], edge["source"])
             # tgt_id = table_to_id.get(edge["target"], edge["target"])
@@ -100,30 +292,23 @@ class SchemaSuggestionService:
             # edge["target"] = tgt_id
 
             key = (src_id, tgt_id)
-            if key not in merged_edges:
-                merged_edges[key] = {
-                    "id": f"{src_id}-{tgt_id}",
-                    "type": "relation",
-                    "source": src_id,
-                    "target": tgt_id,
-                    "data": {}
-                }
+            reverse_key = (tgt_id, src_id)
 
-            # Merge all connection types inside data
-            for conn_type, conn_data in edge["data"].items():
-                merged_edges[key]["data"][conn_type] = conn_data
+            # Fold reversed edges into the edge seen first for this node pair
+            if reverse_key != key and reverse_key in merged_edges:
+                reverse_data = merged_edges[reverse_key].data
+                for conn_type, conn_data in edge["data"].items():
+                    reverse_data[conn_type] = {**conn_data, "reversed": True}
+                continue
 
-        # 3. Detect reversed edges and merge them into the correct edge
-        for (src, tgt), edge in list(merged_edges.items()):
-            reverse_key = (tgt, src)
-            if reverse_key in merged_edges and reverse_key != (src, tgt):
-                reverse_edge = merged_edges.pop(reverse_key)
-                for conn_type, conn_data in reverse_edge["data"].items():
-                    conn_data["reversed"] = True
-                    edge["data"][conn_type] = conn_data
+            merged = merged_edges.get(key)
+            if merged is None:
+                merged = merged_edges[key] = _MergedEdge(src_id, tgt_id)
 
-        schema["edges"] = list(merged_edges.values())
-        return schema
+            # Merge all connection types inside data
+            merged.data.update(edge["data"])
+
+        return {**schema, "edges": [merged.to_dict() for merged in merged_edges.values()]}
     
     def _get_fallback_prompt(self) -> str:
         """Fallback prompt if file is not found."""
@@ -138,23 +323,19 @@ class SchemaSuggestionService:
         edges = []
         node_positions = [(100, 100), (400, 100), (700, 100), (250, 300), (550, 300)]
         
+        # Without any edge files, every data source is treated as a node file
+        has_edge_files = any("edges_" in ds.file.name.lower() for ds in data_sources)
+        
         # Create nodes from data sources that look like node files
         for i, ds in enumerate(data_sources):
-            if "nodes_" in ds.file.name.lower() or not any("edges_" in other_ds.file.name.lower() for other_ds in data_sources):
+            if "nodes_" in ds.file.name.lower() or not has_edge_files:
                 # Extract entity type from filename or use generic
                 entity_type = ds.file.name.replace("nodes_", "").replace(".csv", "").title()
                 if not entity_type or entity_type == ds.file.name:
                     entity_type = f"Entity{i+1}"
                 
                 # Create properties from columns
-                properties = {}
-                for col in ds.columns:
-                    prop_type = self._infer_column_type(col, ds.sampleRow[ds.columns.index(col)] if ds.columns.index(col) < len(ds.sampleRow) else "")
-                    properties[col] = {
-                        "col": col,
-                        "type": prop_type,
-                        "checked": True
-                    }
+                properties = self._column_properties(ds)
                 
                 # Determine primary key
                 primary_key = "id" if "id" in ds.columns else ds.columns[0] if ds.columns else None
@@ -172,6 +353,9 @@ class SchemaSuggestionService:
                 }
                 nodes.append(node)
         
+        # Lowercased node name -> node id, for matching edge endpoints
+        name_to_id = {node["data"]["name"].lower(): node["id"] for node in nodes}
+        
         # Create edges from data sources that look like edge files
         edge_counter = 1
         for ds in data_sources:
@@ -186,27 +370,12 @@ class SchemaSuggestionService:
                     relationship_name = "_".join(filename_parts[2:])
                     
                     # Find matching nodes
-                    source_node = None
-                    target_node = None
-                    
-                    for node in nodes:
-                        node_name = node["data"]["name"].lower()
-                        if source_type.lower() in node_name or node_name in source_type.lower():
-                            source_node = node["id"]
-                        if target_type.lower() in node_name or node_name in target_type.lower():
-                            target_node = node["id"]
+                    source_node = self._match_node(source_type, name_to_id)
+                    target_node = self._match_node(target_type, name_to_id)
                     
                     if source_node and target_node:
                         # Create properties from edge columns
-                        edge_properties = {}
-                        for col in ds.columns:
-                            if col.lower() not in ["source", "target", "id"]:
-                                prop_type = self._infer_column_type(col, ds.sampleRow[ds.columns.index(col)] if ds.columns.index(col) < len(ds.sampleRow) else "")
-                                edge_properties[col] = {
-                                    "col": col,
-                                    "type": prop_type,
-                                    "checked": True
-                                }
+                        edge_properties = self._column_properties(ds, exclude=EDGE_ENDPOINT_COLUMNS)
                         
                         edge = {
                             "id": f"edge_{edge_counter}",
@@ -232,17 +401,43 @@ class SchemaSuggestionService:
             "edges": edges
         }
         
-        return json.dumps(schema, indent=2)
+        return orjson.dumps(schema, option=orjson.OPT_INDENT_2).decode()
+    
+    def _column_properties(self, ds: DataSource, exclude: frozenset = frozenset()) -> Dict[str, Any]:
+        """Build the property map for a data source's columns in one pass."""
+        samples = chain(ds.sampleRow, repeat(""))
+        return {
+            col: {
+                "col": col,
+                "type": self._infer_column_type(col, sample),
+                "checked": True
+            }
+            for col, sample in zip(ds.columns, samples)
+            if col.lower() not in exclude
+        }
+    
+    def _match_node(self, type_name: str, name_to_id: Dict[str, str]):
+        """Find the node id for an entity type named in an edge filename."""
+        type_lower = type_name.lower()
+        node_id = name_to_id.get(type_lower)
+        if node_id is not None:
+            return node_id
+        
+        # Fall back to substring matching in either direction; last match wins
+        for node_name, candidate_id in name_to_id.items():
+            if type_lower in node_name or node_name in type_lower:
+                node_id = candidate_id
+        return node_id
     
     def _infer_column_type(self, column_name: str, sample_value: str) -> str:
         """Infer column type from name and sample value."""
         column_lower = column_name.lower()
         
         # Check for numeric types
-        if any(word in column_lower for word in ["id", "count", "number", "quantity", "amount"]):
+        if _INT_COLUMN_RE.search(column_lower):
             return "int"
         
-        if any(word in column_lower for word in ["price", "cost", "rate", "percentage", "score"]):
+        if _DOUBLE_COLUMN_RE.search(column_lower):
             return "double"
         
         # Try to parse sample value
@@ -261,36 +456,55 @@ class SchemaSuggestionService:
 
     def _clean_json_response(self, text: str):
         # Remove triple backticks and optional 'json'
-        cleaned = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip(), flags=re.MULTILINE)
+        cleaned = _FENCE_RE.sub("", text.strip())
         return cleaned
     
+    def _retry_delay(self, attempt: int, response: httpx.Response = None) -> float:
+        """Seconds to wait before the next attempt.
+        
+        Honours a numeric Retry-After header, otherwise uses exponential
+        backoff with full jitter so concurrent callers don't retry in lockstep.
+        """
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+            if retry_after:
+                try:
+                    return min(float(retry_after), MAX_RETRY_BACKOFF)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(MAX_RETRY_BACKOFF, 2 ** (attempt - 1)))
+    
     async def _call_openai(self, prompt: str) -> str:
         """Call OpenAI API with retry on transient errors."""
         max_retries = 5
-        backoff = 1  # seconds
 
         for attempt in range(1, max_retries + 1):
             try:
-                async with httpx.AsyncClient(timeout=60) as client:
-                    response = await client.post(
-                        "https://api.openai.com/v1/responses",
-                        headers={
-                            "Authorization": f"Bearer {self.api_key}",
-                            "Content-Type": "application/json"
-                        },
-                        json={
-                            "model": "gpt-4.1",
-                            "input": prompt,
-                            "temperature": 0
-                        }
-                    )
+                response = await _client.post(
+                    "https://api.openai.com/v1/responses",
+                    headers={
+                        "Authorization": f"Bearer {self.api_key}",
+                        "Content-Type": "application/json"
+                    },
+                    json={
+                        "model": "gpt-4.1",
+                        "input": prompt,
+                        "temperature": 0
+                    }
+                )
+
+                if response.status_code in RETRYABLE_STATUS_CODES and attempt < max_retries:
+                    wait_time = self._retry_delay(attempt, response)
+                    print(f"Attempt {attempt} got status {response.status_code}, retrying in {wait_time:.1f}s...")
+                    await asyncio.sleep(wait_time)
+                    continue
 
                 if response.status_code != 200:
                     raise Exception(
                         f"OpenAI API call failed with status {response.status_code}: {response.text}"
                     )
 
-                result = response.json()
+                result = orjson.loads(response.content)
                 return self._clean_json_response(
                     result["output"][0]["content"][0]["text"]
                 )
@@ -298,8 +512,8 @@ class SchemaSuggestionService:
             except (httpx.RequestError, httpx.ConnectError, httpx.ConnectTimeout) as e:
                 if attempt == max_retries:
                     raise Exception(f"OpenAI API request failed after {max_retries} attempts: {str(e)}")
-                wait_time = backoff * (2 ** (attempt - 1))
-                print(f"Attempt {attempt} failed ({e}), retrying in {wait_time}s...")
+                wait_time = self._retry_delay(attempt)
+                print(f"Attempt {attempt} failed ({e}), retrying in {wait_time:.1f}s...")
                 await asyncio.sleep(wait_time)
 
             except Exception as e:
@@ -309,22 +523,25 @@ class SchemaSuggestionService:
     async def _call_anthropic(self, prompt: str) -> str:
         """Call Anthropic API."""
         # Implement Anthropic API call
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.anthropic.com/v1/messages",
-                headers={
-                    "x-api-key": self.api_key,
-                    "Content-Type": "application/json",
-                    "anthropic-version": "2023-06-01"
-                },
-                json={
-                    "model": "claude-3-sonnet-20240229",
-                    "max_tokens": 4000,
-                    "messages": [{"role": "user", "content": prompt}]
-                }
-            )
-            result = response.json()
-            return result["content"][0]["text"]
+        response = await _client.post(
+            "https://api.anthropic.com/v1/messages",
+            headers={
+                "x-api-key": self.api_key,
+                "Content-Type": "application/json",
+                "anthropic-version": "2023-06-01"
+            },
+            json={
+                "model": "claude-3-sonnet-20240229",
+                "max_tokens": 4000,
+                "messages": [{"role": "user", "content": prompt}]
+            }
+        )
+        result = response.json()
+        return result["content"][0]["text"]
+    
+    async def aclose(self):
+        """Close the shared HTTP client on application shutdown."""
+        await _client.aclose()
     
     def _create_fallback_schema(self, data_sources: List[DataSource]) -> SuggestedSchema:
         """Create a basic fallback schema if LLM fails."""
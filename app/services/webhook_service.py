@@ -1,13 +1,26 @@
 """Webhook service for sending status updates."""
 
+import asyncio
 import httpx
 import logging
+import orjson
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 
 logger = logging.getLogger(__name__)
 
+# Shared client so webhook notifications reuse pooled connections. HTTP/2 is
+# negotiated via ALPN, so receivers without it still get HTTP/1.1.
+_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+)
+
+# Delivery queues, sharded by webhook URL so each receiver sees its updates in order
+_queues: List[asyncio.Queue] = []
+_workers: List[asyncio.Task] = []
+
 
 class WebhookStatus(Enum):
     """Webhook status types."""
@@ -22,6 +35,8 @@ class WebhookService:
     """Service for sending webhook notifications."""
     
     TIMEOUT = 10.0  # seconds
+    WORKER_COUNT = 4
+    QUEUE_SIZE = 256  # per worker
     
     @staticmethod
     async def send_status(
@@ -32,7 +47,10 @@ class WebhookService:
         error: Optional[str] = None,
         metadata: Optional[dict] = None
     ):
-        """Send status update to webhook URL.
+        """Queue a status update for delivery to the webhook URL.
+        
+        Returns immediately once the update is queued; delivery happens on
+        a background worker. Updates for the same URL are delivered in order.
         
         Args:
             webhook_url: The webhook endpoint URL
@@ -58,17 +76,73 @@ class WebhookService:
         if metadata:
             payload["metadata"] = metadata
         
+        if not _workers:
+            # Dispatcher not running (e.g. outside the app lifespan); deliver inline
+            await WebhookService._deliver(webhook_url, payload)
+            return
+        
+        queue = _queues[hash(webhook_url) % len(_queues)]
+        if queue.full():
+            # Drop the oldest pending update rather than block the caller
+            dropped_url, dropped_payload = queue.get_nowait()
+            queue.task_done()
+            logger.warning(
+                f"Webhook queue full, dropping {dropped_payload['status']} update for {dropped_url}"
+            )
+        queue.put_nowait((webhook_url, payload))
+    
+    @staticmethod
+    async def _deliver(webhook_url: str, payload: dict):
+        """POST a single payload to the webhook URL."""
         try:
-            async with httpx.AsyncClient(timeout=WebhookService.TIMEOUT) as client:
-                response = await client.post(webhook_url, json=payload)
-                response.raise_for_status()
-                logger.info(f"Webhook sent successfully to {webhook_url} with status {status.value}")
+            response = await _client.post(
+                webhook_url,
+                content=orjson.dumps(payload),
+                headers={"Content-Type": "application/json"},
+                timeout=WebhookService.TIMEOUT
+            )
+            response.raise_for_status()
+            logger.info(f"Webhook sent successfully to {webhook_url} with status {payload['status']}")
                 
         except httpx.RequestError as e:
             logger.warning(f"Failed to send webhook to {webhook_url}: {str(e)}")
         except Exception as e:
             logger.error(f"Unexpected error sending webhook to {webhook_url}: {str(e)}")
     
+    @staticmethod
+    async def _worker(queue: asyncio.Queue):
+        """Drain one delivery queue until cancelled."""
+        while True:
+            webhook_url, payload = await queue.get()
+            try:
+                await WebhookService._deliver(webhook_url, payload)
+            finally:
+                queue.task_done()
+    
+    @staticmethod
+    def start():
+        """Start the background delivery workers."""
+        if _workers:
+            return
+        
+        for _ in range(WebhookService.WORKER_COUNT):
+            queue = asyncio.Queue(maxsize=WebhookService.QUEUE_SIZE)
+            _queues.append(queue)
+            _workers.append(asyncio.create_task(WebhookService._worker(queue)))
+    
+    @staticmethod
+    async def shutdown():
+        """Deliver pending updates, then stop the background workers."""
+        for queue in _queues:
+            await queue.join()
+        
+        for worker in _workers:
+            worker.cancel()
+        await asyncio.gather(*_workers, return_exceptions=True)
+        
+        _workers.clear()
+        _queues.clear()
+    
     @staticmethod
     async def send_started(webhook_url: str, message: str = "Job processing started"):
         """Send started status."""
@@ -104,6 +178,11 @@ class WebhookService:
             job_id=job_id, 
             error=error
         )
+    
+    @staticmethod
+    async def aclose():
+        """Close the shared HTTP client on application shutdown."""
+        await _client.aclose()
 
 
 # Create singleton instance
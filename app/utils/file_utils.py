@@ -1,48 +1,69 @@
 """File operations utilities."""
 
+import codecs
 import csv
 import os
-import json
 import shutil
 import uuid
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import io
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 from pathlib import Path
 
+import orjson
+
 from app.models.schemas import DataSource, FileInfo
 
 
 def copy_files_to_temp_dir(source_dir: str, temp_dir: str) -> Dict[str, str]:
-    """Copy files from source directory to temporary directory and return mapping."""
-    file_mapping = {}
+    """Copy files from source directory to temporary directory and return mapping.
     
+    Files are copied concurrently; shutil.copy2 already uses os.sendfile on
+    Linux, so each copy stays in the kernel.
+    """
     if not os.path.exists(source_dir):
-        return file_mapping
+        return {}
+    
+    with os.scandir(source_dir) as entries:
+        filenames = [entry.name for entry in entries if entry.is_file()]
+    
+    if not filenames:
+        return {}
     
-    for filename in os.listdir(source_dir):
-        source_path = os.path.join(source_dir, filename)
+    def copy_one(filename: str) -> Tuple[str, str]:
         dest_path = os.path.join(temp_dir, filename)
-        
-        if os.path.isfile(source_path):
-            shutil.copy2(source_path, dest_path)
-            file_mapping[filename] = dest_path
+        shutil.copy2(os.path.join(source_dir, filename), dest_path)
+        return filename, dest_path
     
-    return file_mapping
+    max_workers = min(32, (os.cpu_count() or 1) * 4, len(filenames))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(executor.map(copy_one, filenames))
 
 
 def update_file_paths_in_config(config: Dict[str, Any], file_mapping: Dict[str, str]) -> Dict[str, Any]:
-    """Update file paths in configuration with new mappings."""
-    updated_config = json.loads(json.dumps(config))
+    """Update file paths in configuration with new mappings.
+    
+    The input config is left untouched; only items whose path changes are copied.
+    """
+    updated_config = {**config}
+    basename = os.path.basename
     
     def update_paths(items):
-        for item in items:
-            if "input" in item and item["input"].get("type") == "file":
-                original_path = item["input"]["path"]
-                filename = os.path.basename(original_path)
-                if filename in file_mapping:
-                    item["input"]["path"] = file_mapping[filename]
-        return items
+        updated_items = None
+        for i, item in enumerate(items):
+            source = item.get("input")
+            if not source or source.get("type") != "file":
+                continue
+            new_path = file_mapping.get(basename(source["path"]))
+            if new_path is None:
+                continue
+            if updated_items is None:
+                updated_items = list(items)
+            updated_items[i] = {**item, "input": {**source, "path": new_path}}
+        # Lists with nothing to remap are shared rather than copied
+        return items if updated_items is None else updated_items
     
     if "vertices" in updated_config:
         updated_config["vertices"] = update_paths(updated_config["vertices"])
@@ -54,62 +75,94 @@ def update_file_paths_in_config(config: Dict[str, Any], file_mapping: Dict[str,
 
 def get_output_files(output_dir: str) -> List[str]:
     """Get list of output files from directory."""
-    if not os.path.exists(output_dir):
+    try:
+        with os.scandir(output_dir) as entries:
+            return [entry.path for entry in entries if entry.is_file()]
+    except FileNotFoundError:
         return []
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """Unseekable sink that collects bytes written by ZipFile until drained."""
+    
+    def __init__(self):
+        self._chunks: List[bytes] = []
+    
+    def writable(self) -> bool:
+        return True
     
-    return [
-        os.path.join(output_dir, f) 
-        for f in os.listdir(output_dir) 
-        if os.path.isfile(os.path.join(output_dir, f))
-    ]
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
 
 
-def create_zip_file(files: List[str]) -> io.BytesIO:
-    """Create a zip file in memory from list of file paths."""
-    memory_file = io.BytesIO()
-    with zipfile.ZipFile(memory_file, 'w') as zf:
+def create_zip_stream(files: List[str], chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """Stream a zip archive of the given files chunk by chunk.
+    
+    Entries are stored uncompressed with data descriptors, so the archive is
+    produced in one sequential pass and memory stays at about one chunk.
+    """
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
         for file_path in files:
-            zf.write(file_path, arcname=os.path.basename(file_path))
-    memory_file.seek(0)
-    return memory_file
+            zinfo = zipfile.ZipInfo.from_file(file_path, arcname=os.path.basename(file_path))
+            zinfo.compress_type = zipfile.ZIP_STORED
+            with open(file_path, 'rb') as src, zf.open(zinfo, 'w', force_zip64=True) as dest:
+                while chunk := src.read(chunk_size):
+                    dest.write(chunk)
+                    yield buffer.drain()
+            yield buffer.drain()
+    yield buffer.drain()
 
 
 def get_directory_size(directory: str) -> int:
-    """Calculate total size of directory in bytes."""
+    """Calculate total size of directory in bytes, not following symlinks."""
     total = 0
-    for dirpath, _, filenames in os.walk(directory):
-        for f in filenames:
-            fp = os.path.join(dirpath, f)
-            if not os.path.islink(fp):
-                total += os.path.getsize(fp)
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_symlink():
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            continue
     return total
 
 
 def count_files_in_directory(directory: str) -> int:
     """Count number of files in directory."""
-    if not os.path.exists(directory) or not os.path.isdir(directory):
-        return 0
     try:
-        return len([f for f in os.listdir(directory) 
-                   if os.path.isfile(os.path.join(directory, f))])
-    except Exception:
+        with os.scandir(directory) as entries:
+            return sum(1 for entry in entries if entry.is_file())
+    except OSError:
         return 0
 
 
 def load_json_file(file_path: str) -> Dict[str, Any]:
     """Load JSON from file with error handling."""
     try:
-        with open(file_path, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
+        with open(file_path, 'rb') as f:
+            return orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
         return {}
 
 
 def save_json_file(file_path: str, data: Dict[str, Any]):
     """Save data to JSON file."""
     os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    with open(file_path, 'w') as f:
-        json.dump(data, f, indent=2)
+    with open(file_path, 'wb') as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
 
 
 def ensure_directory(directory: str):
@@ -119,44 +172,86 @@ def ensure_directory(directory: str):
 
 def cleanup_directory(directory: str, ignore_errors: bool = True):
     """Remove directory and all its contents."""
-    if os.path.exists(directory):
+    try:
         shutil.rmtree(directory, ignore_errors=ignore_errors)
+    except FileNotFoundError:
+        pass
 
 
 def get_latest_directory(base_dir: str) -> str:
     """Get the most recently modified directory in base_dir."""
-    if not os.path.exists(base_dir):
-        return None
-    
-    import glob
-    job_dirs = glob.glob(os.path.join(base_dir, "*"))
-    if not job_dirs:
+    latest_dir = None
+    latest_mtime = float("-inf")
+    try:
+        entries = os.scandir(base_dir)
+    except OSError:
+        # glob("*") returned nothing for missing, non-directory or unreadable paths
         return None
+    with entries:
+        for entry in entries:
+            # Match the previous glob("*") behaviour of ignoring hidden entries
+            if entry.name.startswith('.') or not entry.is_dir():
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+            except OSError:
+                continue
+            if mtime > latest_mtime:
+                latest_mtime = mtime
+                latest_dir = entry.path
     
-    job_dirs.sort(key=os.path.getmtime, reverse=True)
-    return job_dirs[0]
+    return latest_dir
 
 def is_csv_file(filename: str) -> bool:
     """Check if file is a CSV based on extension."""
     return filename.lower().endswith('.csv')
 
 
+CSV_DELIMITERS = [',', ';', '\t', '|', ':']
+_DELIMITER_BYTES = [(delimiter, delimiter.encode()) for delimiter in CSV_DELIMITERS]
+# Tried in order after BOM detection; latin1 accepts any byte sequence, so it goes last
+CSV_ENCODINGS = ['utf-8', 'cp1252', 'latin1']
+CSV_SNIFF_BYTES = 65536
+
+# Dots and dashes are stripped before the str.isdigit test for numeric-looking cells
+_NUMERIC_CELL_STRIP = str.maketrans('', '', '.-')
+
+
+def _delimiter_from_sample(sample: bytes) -> str:
+    """Pick the most frequent candidate delimiter in a byte sample."""
+    # Count occurrences of each delimiter
+    delimiter_counts = {delimiter: sample.count(encoded) for delimiter, encoded in _DELIMITER_BYTES}
+    
+    # Return the delimiter with the highest count (minimum 2 occurrences)
+    best_delimiter = max(delimiter_counts, key=delimiter_counts.get)
+    return best_delimiter if delimiter_counts[best_delimiter] >= 2 else ','
+
+
+def _decode_sample(sample: bytes) -> Tuple[str, str]:
+    """Decode a byte sample with the first encoding that accepts it.
+    
+    The sample may end mid-character, so decoding is not finalized.
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        encoding = 'utf-8-sig'
+        return encoding, codecs.getincrementaldecoder(encoding)(errors='replace').decode(sample, final=False)
+    
+    for encoding in CSV_ENCODINGS:
+        try:
+            text = codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding, text
+        except UnicodeDecodeError:
+            continue
+    
+    # Fallback to utf-8 with error handling
+    return 'utf-8', sample.decode('utf-8', errors='replace')
+
+
 def detect_csv_delimiter(file_path: str, sample_size: int = 1024) -> str:
     """Detect CSV delimiter by analyzing a sample of the file."""
-    delimiters = [',', ';', '\t', '|', ':']
-    
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-            sample = file.read(sample_size)
-        
-        # Count occurrences of each delimiter
-        delimiter_counts = {}
-        for delimiter in delimiters:
-            delimiter_counts[delimiter] = sample.count(delimiter)
-        
-        # Return the delimiter with the highest count (minimum 2 occurrences)
-        best_delimiter = max(delimiter_counts, key=delimiter_counts.get)
-        return best_delimiter if delimiter_counts[best_delimiter] >= 2 else ','
+        with open(file_path, 'rb') as file:
+            return _delimiter_from_sample(file.read(sample_size))
         
     except Exception as e:
         print(f"Error detecting delimiter for {file_path}: {str(e)}")
@@ -164,86 +259,129 @@ def detect_csv_delimiter(file_path: str, sample_size: int = 1024) -> str:
 
 def detect_encoding(file_path: str, sample_size: int = 8192) -> str:
     """Detect file encoding."""
-    encodings_to_try = ['utf-8', 'utf-8-sig', 'latin1', 'cp1252', 'iso-8859-1']
-    
-    for encoding in encodings_to_try:
-        try:
-            with open(file_path, 'r', encoding=encoding) as file:
-                file.read(sample_size)
-            return encoding
-        except UnicodeDecodeError:
-            continue
-    
-    # Fallback to utf-8 with error handling
-    return 'utf-8'
+    with open(file_path, 'rb') as file:
+        return _decode_sample(file.read(sample_size))[0]
 
 
-def validate_csv_structure(file_path: str, delimiter: str = None) -> Dict[str, Any]:
-    """Validate CSV file structure and return metadata."""
-    if delimiter is None:
-        delimiter = detect_csv_delimiter(file_path)
-    
-    encoding = detect_encoding(file_path)
+def _sniff_and_parse_header(
+    file_path: str,
+    delimiter: Optional[str] = None,
+    sample_bytes: int = CSV_SNIFF_BYTES,
+    count_rows: bool = False
+) -> Tuple[Dict[str, Any], List[List[str]], int]:
+    """Sniff encoding and delimiter and parse the first two rows in one read.
     
+    Returns the validation metadata, the parsed rows (header and first data
+    row, when present) and the file size. ``row_count`` counts every row,
+    header included. It is estimated from the file size and the line density
+    of the sample, unless count_rows is set and the whole file fits in the
+    sample, in which case the remaining rows are parsed and counted exactly.
+    """
     metadata = {
         "is_valid": False,
         "delimiter": delimiter,
-        "encoding": encoding,
+        "encoding": None,
         "row_count": 0,
         "column_count": 0,
         "has_header": False,
         "errors": []
     }
+    rows = []
+    file_size = 0
+    exact_row_count = None
+    sample_lines = 0
+    sample_span = 0
     
     try:
-        with open(file_path, 'r', encoding=encoding, errors='replace') as file:
-            csv_reader = csv.reader(file, delimiter=delimiter)
+        with open(file_path, 'rb') as file:
+            file_size = os.fstat(file.fileno()).st_size
+            sample = file.read(sample_bytes)
             
-            rows = list(csv_reader)
+            encoding, text = _decode_sample(sample)
+            if delimiter is None:
+                delimiter = _delimiter_from_sample(sample[:1024])
+            metadata["encoding"] = encoding
+            metadata["delimiter"] = delimiter
             
-            if not rows:
-                metadata["errors"].append("File is empty")
-                return metadata
+            text_buffer = io.StringIO(text, newline='')
+            csv_reader = csv.reader(text_buffer, delimiter=delimiter)
+            rows = [row for row in (next(csv_reader, None), next(csv_reader, None)) if row is not None]
+            if count_rows and len(sample) >= file_size:
+                exact_row_count = len(rows) + sum(1 for _ in csv_reader)
+            else:
+                # Line density of the complete lines in the sample drives the estimate
+                sample_span = sample.rfind(b'\n') + 1
+                sample_lines = sample.count(b'\n', 0, sample_span)
+                if sample_span < len(sample) and len(sample) >= file_size:
+                    # Count the final row of a file without a trailing newline
+                    sample_lines += 1
+                    sample_span = len(sample)
             
-            metadata["row_count"] = len(rows)
-            metadata["column_count"] = len(rows[0]) if rows else 0
-            
-            # Simple heuristic to detect header
-            if len(rows) >= 2:
-                first_row = rows[0]
-                second_row = rows[1]
-                
-                # Check if first row looks like headers (non-numeric strings)
-                header_score = 0
-                for cell in first_row:
-                    if cell and not cell.replace('.', '').replace('-', '').isdigit():
-                        header_score += 1
-                
-                metadata["has_header"] = header_score > len(first_row) * 0.5
+            # The rows ran past a truncated sample; parse them from the file instead
+            if len(sample) < file_size and text_buffer.tell() >= len(text):
+                file.seek(0)
+                text_file = io.TextIOWrapper(file, encoding=encoding, errors='replace', newline='')
+                csv_reader = csv.reader(text_file, delimiter=delimiter)
+                rows = [row for row in (next(csv_reader, None), next(csv_reader, None)) if row is not None]
+                text_file.detach()
+                # Rows this long make the sample unrepresentative; estimate from them instead
+                sample_lines = 0
+        
+        if not rows:
+            metadata["errors"].append("File is empty")
+            return metadata, rows, file_size
+        
+        first_row = rows[0]
+        if exact_row_count is not None:
+            metadata["row_count"] = exact_row_count
+        elif sample_lines:
+            metadata["row_count"] = max(len(rows), round(sample_lines * file_size / sample_span))
+        else:
+            avg_row_length = sum(len(delimiter.join(row)) + 1 for row in rows) / len(rows)
+            metadata["row_count"] = max(len(rows), round(file_size / avg_row_length))
+        metadata["column_count"] = len(first_row)
+        
+        # Simple heuristic to detect header
+        if len(rows) >= 2:
+            # Check if first row looks like headers (non-numeric strings)
+            header_score = sum(1 for cell in first_row if cell and not cell.translate(_NUMERIC_CELL_STRIP).isdigit())
             
-            metadata["is_valid"] = True
+            metadata["has_header"] = header_score > len(first_row) * 0.5
+        
+        metadata["is_valid"] = True
             
     except Exception as e:
         metadata["errors"].append(str(e))
     
+    return metadata, rows, file_size
+
+
+def validate_csv_structure(file_path: str, delimiter: str = None) -> Dict[str, Any]:
+    """Validate CSV file structure and return metadata.
+    
+    ``row_count`` includes the header row. It is exact for files that fit in
+    the sniff sample and an estimate from the file size for larger ones.
+    """
+    metadata, _, _ = _sniff_and_parse_header(file_path, delimiter, count_rows=True)
     return metadata
 
+_MIME_TYPES_BY_EXTENSION = {
+    'csv': 'text/csv',
+    'json': 'application/json',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'xls': 'application/vnd.ms-excel',
+    'xlsm': 'application/vnd.ms-excel.sheet.macroEnabled.12',
+    'xlsb': 'application/vnd.ms-excel.sheet.binary.macroEnabled.12',
+    'txt': 'text/plain',
+    'tsv': 'text/tab-separated-values'
+}
+
+
+@lru_cache(maxsize=256)
 def get_file_type(filename: str) -> str:
     """Get MIME type based on file extension."""
-    extension = filename.lower().split('.')[-1] if '.' in filename else ''
-    
-    type_mapping = {
-        'csv': 'text/csv',
-        'json': 'application/json',
-        'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        'xls': 'application/vnd.ms-excel',
-        'xlsm': 'application/vnd.ms-excel.sheet.macroEnabled.12',
-        'xlsb': 'application/vnd.ms-excel.sheet.binary.macroEnabled.12',
-        'txt': 'text/plain',
-        'tsv': 'text/tab-separated-values'
-    }
-    
-    return type_mapping.get(extension, 'application/octet-stream')
+    _, dot, extension = filename.rpartition('.')
+    return _MIME_TYPES_BY_EXTENSION.get(extension.lower() if dot else '', 'application/octet-stream')
 
 
 def create_error_datasource(filename: str, error_message: str) -> DataSource:
@@ -259,6 +397,9 @@ def create_error_datasource(filename: str, error_message: str) -> DataSource:
         sampleRow=[error_message]
     )
 
+_EMPTY_COLUMN_NAMES = frozenset({'', 'none', 'null'})
+
+
 def clean_column_names(columns: List[str]) -> List[str]:
     """Clean and standardize column names."""
     cleaned = []
@@ -266,7 +407,7 @@ def clean_column_names(columns: List[str]) -> List[str]:
         clean_col = str(col).strip()
         
         # Handle empty or None columns
-        if not clean_col or clean_col.lower() in ['none', 'null', '']:
+        if clean_col.lower() in _EMPTY_COLUMN_NAMES:
             clean_col = f"column_{len(cleaned) + 1}"
         
         cleaned.append(clean_col)
@@ -276,55 +417,33 @@ def clean_column_names(columns: List[str]) -> List[str]:
 
 def clean_sample_row(row: List[str], expected_length: int) -> List[str]:
     """Clean and standardize sample row data."""
-    cleaned = []
-    for i, cell in enumerate(row):
-        if i >= expected_length:
-            break
-        
-        # Convert to string and strip whitespace
-        clean_cell = str(cell).strip() if cell is not None else ""
-        cleaned.append(clean_cell)
+    # Convert to string and strip whitespace
+    cleaned = ["" if cell is None else str(cell).strip() for cell in row[:expected_length]]
     
     # Pad with empty strings if row is shorter than expected
-    while len(cleaned) < expected_length:
-        cleaned.append("")
+    cleaned.extend([""] * (expected_length - len(cleaned)))
     
     return cleaned
 
 def preprocess_csv_file(file_path: str, filename: str) -> Optional[DataSource]:
     """Preprocess a CSV file to extract columns and sample row."""
     try:
-        # Get file stats
-        file_stats = os.stat(file_path)
-        file_size = file_stats.st_size
-        
-        # Validate and get metadata
-        csv_metadata = validate_csv_structure(file_path)
+        # Sniff format and read the header and sample row in a single pass
+        csv_metadata, rows, file_size = _sniff_and_parse_header(file_path)
         
         if not csv_metadata["is_valid"]:
             print(f"Invalid CSV file {filename}: {csv_metadata['errors']}")
             return create_error_datasource(filename, "Invalid CSV structure")
         
-        delimiter = csv_metadata["delimiter"]
-        encoding = csv_metadata["encoding"]
+        # Get headers (first row)
+        columns = clean_column_names(rows[0])
         
-        with open(file_path, 'r', encoding=encoding, errors='replace') as file:
-            csv_reader = csv.reader(file, delimiter=delimiter)
-            
-            # Get headers (first row)
-            try:
-                raw_columns = next(csv_reader)
-                columns = clean_column_names(raw_columns)
-            except StopIteration:
-                return create_error_datasource(filename, "Empty file")
-            
-            # Get sample row (second row)
-            try:
-                raw_sample_row = next(csv_reader)
-                sample_row = clean_sample_row(raw_sample_row, len(columns))
-            except StopIteration:
-                # Only header row exists, create empty sample
-                sample_row = [""] * len(columns)
+        # Get sample row (second row)
+        if len(rows) > 1:
+            sample_row = clean_sample_row(rows[1], len(columns))
+        else:
+            # Only header row exists, create empty sample
+            sample_row = [""] * len(columns)
         
         # Generate unique ID for this data source
         ds_id = f"ds_{uuid.uuid4().hex[:8]}"
@@ -1,110 +1,127 @@
 """Schema conversion utilities for HugeGraph."""
 
+from functools import lru_cache
 from typing import Union, Dict, Any
+
+import orjson
+
 from ..models.schemas import SchemaDefinition
 
+GROOVY_CACHE_SIZE = 128
+
 
 def json_to_groovy(schema_json: Union[Dict, SchemaDefinition]) -> str:
     """Convert JSON schema definition to Groovy format for HugeGraph."""
-    if isinstance(schema_json, dict):
-        schema = SchemaDefinition(**schema_json)
+    if isinstance(schema_json, SchemaDefinition):
+        key = schema_json.model_dump_json().encode()
     else:
-        schema = schema_json
-    
+        key = orjson.dumps(schema_json)
+    return _json_to_groovy_cached(key)
+
+
+@lru_cache(maxsize=GROOVY_CACHE_SIZE)
+def _json_to_groovy_cached(key: bytes) -> str:
+    """Validate and render a serialized schema, memoized on its JSON bytes."""
+    return _render_groovy(SchemaDefinition.model_validate_json(key))
+
+
+def _render_groovy(schema: SchemaDefinition) -> str:
+    """Render a validated schema definition as Groovy statements."""
     groovy_lines = []
     
     # Generate property key definitions
     for prop in schema.property_keys:
-        line = f'schema.propertyKey("{prop.name}").as{prop.type.capitalize()}()'
+        parts = [f'schema.propertyKey("{prop.name}").as{prop.type.capitalize()}()']
         if prop.cardinality:
-            line += f'.cardinality("{prop.cardinality}")'
+            parts.append(f'.cardinality("{prop.cardinality}")')
         if prop.options:
-            for opt_name, opt_value in prop.options.items():
-                if isinstance(opt_value, str):
-                    line += f'.{opt_name}("{opt_value}")'
-                else:
-                    line += f'.{opt_name}({opt_value})'
-        line += '.ifNotExist().create();'
-        groovy_lines.append(line)
+            parts.extend(_option_parts(prop.options))
+        parts.append('.ifNotExist().create();')
+        groovy_lines.append(''.join(parts))
     
     groovy_lines.append("")
     
     # Generate vertex label definitions
     for vertex in schema.vertex_labels:
-        line = f'schema.vertexLabel("{vertex.name}")'
+        parts = [f'schema.vertexLabel("{vertex.name}")']
         if vertex.id_strategy:
             if vertex.id_strategy == "primary_key":
-                line += '.useCustomizeStringId()'
+                parts.append('.useCustomizeStringId()')
             elif vertex.id_strategy == "customize_number":
-                line += '.useCustomizeNumberId()'
+                parts.append('.useCustomizeNumberId()')
             elif vertex.id_strategy == "customize_string":
-                line += '.useCustomizeStringId()'
+                parts.append('.useCustomizeStringId()')
             elif vertex.id_strategy == "automatic":
-                line += '.useAutomaticId()'
+                parts.append('.useAutomaticId()')
         if vertex.properties:
-            props_str = ', '.join([f'"{prop}"' for prop in vertex.properties])
-            line += f'.properties({props_str})'
+            props_str = ', '.join(f'"{prop}"' for prop in vertex.properties)
+            parts.append(f'.properties({props_str})')
         if vertex.primary_keys:
-            keys_str = ', '.join([f'"{key}"' for key in vertex.primary_keys])
-            line += f'.primaryKeys({keys_str})'
+            keys_str = ', '.join(f'"{key}"' for key in vertex.primary_keys)
+            parts.append(f'.primaryKeys({keys_str})')
         if vertex.nullable_keys:
-            keys_str = ', '.join([f'"{key}"' for key in vertex.nullable_keys])
-            line += f'.nullableKeys({keys_str})'
+            keys_str = ', '.join(f'"{key}"' for key in vertex.nullable_keys)
+            parts.append(f'.nullableKeys({keys_str})')
         if vertex.options:
-            for opt_name, opt_value in vertex.options.items():
-                if isinstance(opt_value, str):
-                    line += f'.{opt_name}("{opt_value}")'
-                else:
-                    line += f'.{opt_name}({opt_value})'
-        line += '.ifNotExist().create();'
-        groovy_lines.append(line)
+            parts.extend(_option_parts(vertex.options))
+        parts.append('.ifNotExist().create();')
+        groovy_lines.append(''.join(parts))
     
     groovy_lines.append("")
     
     # Generate edge label definitions
     for edge in schema.edge_labels:
-        line = f'schema.edgeLabel("{edge.name}")'
-        line += f'.sourceLabel("{edge.source_label}")'
-        line += f'.targetLabel("{edge.target_label}")'
+        parts = [
+            f'schema.edgeLabel("{edge.name}")',
+            f'.sourceLabel("{edge.source_label}")',
+            f'.targetLabel("{edge.target_label}")'
+        ]
         if edge.properties:
-            props_str = ', '.join([f'"{prop}"' for prop in edge.properties])
-            line += f'.properties({props_str})'
+            props_str = ', '.join(f'"{prop}"' for prop in edge.properties)
+            parts.append(f'.properties({props_str})')
         if edge.sort_keys:
-            keys_str = ', '.join([f'"{key}"' for key in edge.sort_keys])
-            line += f'.sortKeys({keys_str})'
+            keys_str = ', '.join(f'"{key}"' for key in edge.sort_keys)
+            parts.append(f'.sortKeys({keys_str})')
         if edge.options:
-            for opt_name, opt_value in edge.options.items():
-                if isinstance(opt_value, str):
-                    line += f'.{opt_name}("{opt_value}")'
-                else:
-                    line += f'.{opt_name}({opt_value})'
-        line += '.ifNotExist().create();'
-        groovy_lines.append(line)
+            parts.extend(_option_parts(edge.options))
+        parts.append('.ifNotExist().create();')
+        groovy_lines.append(''.join(parts))
     
     return '\n'.join(groovy_lines)
 
 
+def _option_parts(options: Dict[str, Any]):
+    """Yield Groovy builder calls for schema options, quoting string values."""
+    for opt_name, opt_value in options.items():
+        if isinstance(opt_value, str):
+            yield f'.{opt_name}("{opt_value}")'
+        else:
+            yield f'.{opt_name}({opt_value})'
+
+
 def generate_annotation_schema(schema_data: Dict[str, Any], job_id: str) -> Dict[str, Any]:
     """Generate annotation schema from schema data."""
-    annotation_schema = {"job_id": job_id, "nodes": [], "edges": []}
-    
-    # Generate nodes from vertex labels
-    for vertex in schema_data.get("vertex_labels", []):
-        annotation_schema["nodes"].append({
+    # Nodes from vertex labels
+    nodes = [
+        {
             "id": vertex["name"],
             "name": vertex["name"],
             "category": "entity",
             "inputs": [{"label": prop, "name": prop, "inputType": "input"}
-                      for prop in vertex.get("properties", [])]
-        })
+                       for prop in vertex.get("properties", ())]
+        }
+        for vertex in schema_data.get("vertex_labels", ())
+    ]
     
-    # Generate edges from edge labels
-    for i, edge in enumerate(schema_data.get("edge_labels", []), 1):
-        annotation_schema["edges"].append({
+    # Edges from edge labels, numbered from 1
+    edges = [
+        {
             "id": str(i),
             "source": edge["source_label"],
             "target": edge["target_label"],
             "label": edge["name"]
-        })
+        }
+        for i, edge in enumerate(schema_data.get("edge_labels", ()), 1)
+    ]
     
-    return annotation_schema
\ No newline at end of file
+    return {"job_id": job_id, "nodes": nodes, "edges": edges}
@@ -173,7 +173,7 @@ public class NetworkXWriter implements Writer {
             "    G.add_edge(source, target, **edge)\n" +  
             "\n" +  
             "with open('%s', 'wb') as f:\n" +  
-            "    pickle.dump(G, f, protocol=4)\n" +  
+            "    pickle.dump(G, f, protocol=5)\n" +  
             "\n" +  
             "print(f'Converted to pickle: {G.number_of_nodes()} nodes, {G.number_of_edges()} edges')\n",  
             jsonPath.replace("\\", "\\\\"),  
@@ -11,10 +11,13 @@ import os
 # API base URL
 BASE_URL = "http://127.0.0.1:8000"
 
+# Shared session so every call reuses the same keep-alive connection
+SESSION = requests.Session()
+
 def test_health():
     """Test the health endpoint"""
     try:
-        response = requests.get(f"{BASE_URL}/api/health")
+        response = SESSION.get(f"{BASE_URL}/api/health")
         print(f"Health check: {response.status_code} - {response.json()}")
         return response.status_code == 200
     except Exception as e:
@@ -24,7 +27,7 @@ def test_health():
 def test_create_session():
     """Test creating an upload session"""
     try:
-        response = requests.post(f"{BASE_URL}/api/upload/create-session")
+        response = SESSION.post(f"{BASE_URL}/api/upload/create-session")
         print(f"Create session: {response.status_code}")
         if response.status_code == 200:
             data = response.json()
@@ -42,21 +45,21 @@ def test_upload_files(session_id):
     if not session_id:
         return False
     
-    # Create a simple test CSV file
-    test_csv = """id,name,age
+    # Simple test CSV files, all sent in a single multipart request
+    test_files = [
+        ('test_data.csv', """id,name,age
 1,Alice,30
 2,Bob,25
-3,Charlie,35"""
+3,Charlie,35"""),
+    ]
     
-    files = {
-        'files': ('test_data.csv', test_csv, 'text/csv')
-    }
+    files = [('files', (name, content, 'text/csv')) for name, content in test_files]
     data = {
         'session_id': session_id
     }
     
     try:
-        response = requests.post(f"{BASE_URL}/api/upload/files", files=files, data=data)
+        response = SESSION.post(f"{BASE_URL}/api/upload/files", files=files, data=data)
         print(f"Upload files: {response.status_code}")
         if response.status_code == 200:
             data = response.json()
@@ -119,7 +122,7 @@ def test_load_data(session_id):
     
     try:
         print("Testing load data endpoint...")
-        response = requests.post(f"{BASE_URL}/api/load", data=data)
+        response = SESSION.post(f"{BASE_URL}/api/load", data=data)
         print(f"Load data: {response.status_code}")
         
         if response.status_code == 200: